@@ -97,6 +97,20 @@ DATABASES = {
     }
 }
 
+# Cache for Riot's API responses, shared between processes when REDIS_URL is set.
+# Otherwise Django's default per-process local memory cache is used.
+# https://docs.djangoproject.com/en/4.0/topics/cache/
+
+REDIS_URL = config("REDIS_URL", default="")
+
+if REDIS_URL:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.redis.RedisCache",
+            "LOCATION": REDIS_URL,
+        }
+    }
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/3.2/ref/settings/#default-auto-field
 
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-15 22:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("api", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="match",
+            name="tiers",
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -7,6 +7,7 @@ class Match(models.Model):
     match_json = models.JSONField(default=dict)
     summoner = models.CharField(max_length=50)
     summoner_json = models.JSONField(default=dict)
+    tiers = models.JSONField(default=list)
 
     class Meta:
         ordering = ["-match_id"]
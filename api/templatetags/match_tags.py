@@ -0,0 +1,11 @@
+"""Template filters used to display the matches"""
+
+from django import template
+
+register = template.Library()
+
+
+@register.filter
+def matchups(participants):
+    """Pairs of participants from each team, e.g. blue side top with red side top"""
+    return zip(participants[:5], participants[5:])
@@ -1,6 +1,7 @@
 """Functions that performs computation on the database"""
 
 from api.models import Summoner, Match
+from api.utils import helpers
 
 def update_summoner_db(summoner_db, player_summary_list):
     for player_summary in player_summary_list:
@@ -15,15 +16,37 @@ def update_summoner_db(summoner_db, player_summary_list):
             else:
                 summoner_db.roles[position_dict]["losses"] += 1
 
-            summoner_db.roles[position_dict]["win_rate"] = int(
-                summoner_db.roles[position_dict]["wins"]
-                / summoner_db.roles[position_dict]["num"]
-                * 100
-            )
-
             summoner_db = add_database_ranked_stats(summoner_db, player_summary)
             summoner_db = add_database_champion_stats(summoner_db, player_summary)
 
+    # Rates only depend on the totals, compute them once after adding every match
+    for role_data in summoner_db.roles.values():
+        role_data["win_rate"] = helpers.get_percentage(
+            role_data["wins"], role_data["num"]
+        )
+
+    for stat_data in summoner_db.stats.values():
+        stat_data["per_min"] = helpers.get_ratio(
+            stat_data["total"], summoner_db.minutes
+        )
+        stat_data["per_match"] = helpers.get_ratio(
+            stat_data["total"], summoner_db.matches
+        )
+
+    # play_rate depends on the summoner's matches, so every champion is updated
+    for champion_data in summoner_db.champions.values():
+        kills_assists = champion_data["kills"] + champion_data["assists"]
+        deaths = champion_data["deaths"]
+        champion_data["kda"] = (
+            round(kills_assists / deaths, 2) if deaths != 0 else kills_assists
+        )
+        champion_data["win_rate"] = helpers.get_percentage(
+            champion_data["wins"], champion_data["num"]
+        )
+        champion_data["play_rate"] = helpers.get_ratio(
+            champion_data["num"], summoner_db.matches
+        )
+
     # order champions in database by number of matches, then by win rate and then by kda
     summoner_db.champions = dict(
         sorted(
@@ -39,112 +62,66 @@ def add_database_ranked_stats(summoner_db, summoner_json):
     summoner_db.matches += 1
     summoner_db.minutes += summoner_json["gameDuration"]
 
-    summoner_db.stats["kills"]["total"] += summoner_json["kills"]
-    summoner_db.stats["kills"]["per_min"] = round(
-        summoner_db.stats["kills"]["total"] / summoner_db.minutes, 2
-    )
-    summoner_db.stats["kills"]["per_match"] = round(
-        summoner_db.stats["kills"]["total"] / summoner_db.matches, 2
-    )
-
-    summoner_db.stats["assists"]["total"] += summoner_json["assists"]
-    summoner_db.stats["assists"]["per_min"] = round(
-        summoner_db.stats["assists"]["total"] / summoner_db.minutes, 2
-    )
-    summoner_db.stats["assists"]["per_match"] = round(
-        summoner_db.stats["assists"]["total"] / summoner_db.matches, 2
-    )
-
-    summoner_db.stats["deaths"]["total"] += summoner_json["deaths"]
-    summoner_db.stats["deaths"]["per_min"] = round(
-        summoner_db.stats["deaths"]["total"] / summoner_db.minutes, 2
-    )
-    summoner_db.stats["deaths"]["per_match"] = round(
-        summoner_db.stats["deaths"]["total"] / summoner_db.matches, 2
-    )
-
-    summoner_db.stats["minions"]["total"] += (
-        summoner_json["totalMinionsKilled"] + summoner_json["neutralMinionsKilled"]
-    )
-    summoner_db.stats["minions"]["per_min"] = round(
-        summoner_db.stats["minions"]["total"] / summoner_db.minutes, 2
-    )
-    summoner_db.stats["minions"]["per_match"] = round(
-        summoner_db.stats["minions"]["total"] / summoner_db.matches, 2
-    )
-
-    summoner_db.stats["vision"]["total"] += summoner_json["visionScore"]
-    summoner_db.stats["vision"]["per_min"] = round(
-        summoner_db.stats["vision"]["total"] / summoner_db.minutes, 2
-    )
-    summoner_db.stats["vision"]["per_match"] = round(
-        summoner_db.stats["vision"]["total"] / summoner_db.matches, 2
+    deltas = (
+        ("kills", summoner_json["kills"]),
+        ("assists", summoner_json["assists"]),
+        ("deaths", summoner_json["deaths"]),
+        (
+            "minions",
+            summoner_json["totalMinionsKilled"] + summoner_json["neutralMinionsKilled"],
+        ),
+        ("vision", summoner_json["visionScore"]),
     )
+    # Only the totals, per_min and per_match are computed by update_summoner_db
+    for stat, delta in deltas:
+        summoner_db.stats[stat]["total"] += delta
 
     return summoner_db
 
 
 def add_database_champion_stats(summoner_db, summoner_json):
-    kills = summoner_json["kills"]
-    assists = summoner_json["assists"]
-    deaths = summoner_json["deaths"]
-    if summoner_json["championName"] not in summoner_db.champions:
-        summoner_db.champions[summoner_json["championName"]] = {
-            "num": 1,
-            "kills": kills,
-            "assists": assists,
-            "deaths": deaths,
-            "kda": round((kills + assists) / deaths, 2)
-            if deaths != 0
-            else kills + assists,
-            "wins": 1 if summoner_json["win"] else 0,
-            "losses": 1 if not summoner_json["win"] else 0,
-            "win_rate": 100 if summoner_json["win"] else 0,
-            "play_rate": 1 / summoner_db.matches,
-            "minions": summoner_json["totalMinionsKilled"]
-            + summoner_json["neutralMinionsKilled"],
-            "vision": summoner_json["visionScore"],
-            "gold": summoner_json["goldEarned"],
-            "damage": summoner_json["totalDamageDealtToChampions"],
-            "last_played": summoner_json["gameCreation"],
+    champion_name = summoner_json["championName"]
+    if champion_name not in summoner_db.champions:
+        summoner_db.champions[champion_name] = {
+            "num": 0,
+            "kills": 0,
+            "assists": 0,
+            "deaths": 0,
+            "kda": 0,
+            "wins": 0,
+            "losses": 0,
+            "win_rate": 0,
+            "play_rate": 0,
+            "minions": 0,
+            "vision": 0,
+            "gold": 0,
+            "damage": 0,
+            "last_played": 0,
         }
+
+    # Only the totals, kda, win_rate and play_rate are computed by update_summoner_db
+    champion_data = summoner_db.champions[champion_name]
+    champion_data["num"] += 1
+    champion_data["kills"] += summoner_json["kills"]
+    champion_data["assists"] += summoner_json["assists"]
+    champion_data["deaths"] += summoner_json["deaths"]
+    if summoner_json["win"]:
+        champion_data["wins"] += 1
     else:
-        champion_data = summoner_db.champions[summoner_json["championName"]]
-        champion_data["num"] += 1
-        champion_data["kills"] += kills
-        champion_data["assists"] += assists
-        champion_data["deaths"] += deaths
-        if champion_data["deaths"] != 0:
-            champion_data["kda"] = round(
-                (champion_data["kills"] + champion_data["assists"])
-                / champion_data["deaths"],
-                2,
-            )
-        else:
-            champion_data["kda"] = champion_data["kills"] + champion_data["assists"]
-        if summoner_json["win"]:
-            champion_data["wins"] += 1
-        else:
-            champion_data["losses"] += 1
-        champion_data["win_rate"] = round(
-            champion_data["wins"] / champion_data["num"] * 100, 2
-        )
-        champion_data["play_rate"] = round(
-            champion_data["num"] / summoner_db.matches, 2
-        )
-        champion_data["minions"] += (
-            summoner_json["totalMinionsKilled"] + summoner_json["neutralMinionsKilled"]
-        )
-        champion_data["vision"] += summoner_json["visionScore"]
-        champion_data["gold"] += summoner_json["goldEarned"]
-        champion_data["damage"] += summoner_json["totalDamageDealtToChampions"]
-        champion_data["last_played"] = summoner_json["gameCreation"]
+        champion_data["losses"] += 1
+    champion_data["minions"] += (
+        summoner_json["totalMinionsKilled"] + summoner_json["neutralMinionsKilled"]
+    )
+    champion_data["vision"] += summoner_json["visionScore"]
+    champion_data["gold"] += summoner_json["goldEarned"]
+    champion_data["damage"] += summoner_json["totalDamageDealtToChampions"]
+    champion_data["last_played"] = summoner_json["gameCreation"]
     return summoner_db
 
 
 def create_user_db(summoner_name):
-    """Create user in database"""
-    Summoner.objects.create(
+    """Create user in database and return it"""
+    return Summoner.objects.create(
         summoner=summoner_name,
         stats={
             "kills": {"total": 0, "per_min": 0, "per_match": 0},
@@ -165,49 +142,51 @@ def create_user_db(summoner_name):
 
 def add_matches_to_db(matchlist, summoner_name):
     """Add matches to database"""
-    add_match_bulk_list = []
-    for match in matchlist:
-        # if match id with summoner name not found, create object in database
-        if Match.objects.filter(match_id=match, summoner=summoner_name).exists():
-            break
-        add_match_bulk_list.append(Match(match_id=match, summoner=summoner_name))
-    Match.objects.bulk_create(add_match_bulk_list)
+    matches_in_db = set(
+        Match.objects.filter(
+            match_id__in=matchlist, summoner=summoner_name
+        ).values_list("match_id", flat=True)
+    )
+    # if match id with summoner name not found, create object in database
+    Match.objects.bulk_create(
+        [
+            Match(match_id=match, summoner=summoner_name)
+            for match in matchlist
+            if match not in matches_in_db
+        ]
+    )
 
 
 def find_matches_not_in_db(matchlist, summoner_name):
     """List of match ids which are not in database"""
-    summary_not_in_database = []
-    for match in matchlist:
-        # If match summary not in database, create object in database
-        if Match.objects.filter(
-            match_id=match, summoner=summoner_name, match_json__exact={}
-        ).exists():
-            summary_not_in_database.append(match)
-            # Limit to 10 for lazy load pagination
-            if len(summary_not_in_database) == 10:
-                break
-    return summary_not_in_database
-
-
-def save_matches_to_db(match_summary_list, summoner_name):
-    """Save matches to database"""
-    bulk_save_summary_list = []
-    for match in match_summary_list:
-        match_object = Match.objects.get(
-            match_id=match["metadata"]["matchId"], summoner=summoner_name
-        )
-        match_object.match_json = match
-        bulk_save_summary_list.append(match_object)
-    Match.objects.bulk_update(bulk_save_summary_list, ["match_json"])
+    matches_without_json = set(
+        Match.objects.filter(
+            match_id__in=matchlist, summoner=summoner_name, match_json__exact={}
+        ).values_list("match_id", flat=True)
+    )
+    # Keep matchlist order (newest first) and limit to 10 for lazy load pagination
+    return [match for match in matchlist if match in matches_without_json][:10]
 
 
-def save_player_summaries_to_db(player_summary_list, summoner_name):
-    """Save player summaries to database"""
-    bulk_save_summary_list = []
-    for player_summary in player_summary_list:
-        match_object = Match.objects.get(
-            match_id=player_summary["matchId"], summoner=summoner_name
+def save_matches_to_db(match_json_list, player_summary_list, summoner_name):
+    """Save matches and the summoner's summary of each one in a single write
+
+    Called inside the transaction that also saves the summoner's stats.
+    """
+    match_ids = [match["metadata"]["matchId"] for match in match_json_list]
+    match_objects = {
+        match_object.match_id: match_object
+        for match_object in Match.objects.filter(
+            match_id__in=match_ids, summoner=summoner_name
         )
+    }
+    for match, player_summary in zip(match_json_list, player_summary_list):
+        match_object = match_objects[match["metadata"]["matchId"]]
+        match_object.match_json = match
         match_object.summoner_json = player_summary
-        bulk_save_summary_list.append(match_object)
-    Match.objects.bulk_update(bulk_save_summary_list, ["summoner_json"])
+    Match.objects.bulk_update(match_objects.values(), ["match_json", "summoner_json"])
+
+
+def save_match_tiers_to_db(match_id, tiers):
+    """Save the players ranks to every copy of the match"""
+    Match.objects.filter(match_id=match_id).update(tiers=tiers)
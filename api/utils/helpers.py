@@ -3,40 +3,106 @@ Functions that performs part of the computation of another function, usually fro
 because the functionality is needed in multiple places.
 """
 
-from datetime import datetime
-from requests import get
+from datetime import date
+from functools import lru_cache
 from decouple import config
-from time import sleep
+from cachetools import TTLCache, cached
+from threading import Lock
+import httpx
+import orjson
 
 API_KEY = config("API")
 
-
-def get_response(url):
-    """Get response from url"""
-    max_attempts = 3
-    attempts = 0
-    while attempts < max_attempts:
-        response = get(url)
-        if response.status_code == 200:
-            return response
-        elif response.status_code == 429:
-            print(
-                "Rate limit exceeded, sleeping for "
-                + response.headers["Retry-After"]
-                + " seconds"
-            )
-            sleep(int(response.headers["Retry-After"]))
-        attempts += 1
-    if attempts >= max_attempts:
-        raise Exception("Failed: Maxed out attempts")
+REGIONS = {
+    "NA1": "AMERICAS",
+    "BR1": "AMERICAS",
+    "LA1": "AMERICAS",
+    "LA2": "AMERICAS",
+    "OC1": "AMERICAS",
+    "EUN1": "EUROPE",
+    "EUW1": "EUROPE",
+    "TR1": "EUROPE",
+    "RU": "EUROPE",
+    "KR": "ASIA",
+    "JP1": "ASIA",
+}
+
+QUEUE_MODES = {400: "Normal Draft", 420: "Ranked Solo", 430: "Normal Blind"}
+
+SUMMONER_SPELLS = {
+    1: "summoner_boost",
+    3: "summoner_exhaust",
+    4: "summoner_flash",
+    6: "summoner_haste",
+    7: "summoner_heal",
+    11: "summoner_smite",
+    12: "summoner_teleport",
+    13: "summonermana",
+    14: "summonerignite",
+    21: "summonerbarrier",
+    32: "summoner_mark",
+}
+
+RUNE_SECONDARY = {
+    8000: "7201_precision",
+    8100: "7200_domination",
+    8200: "7202_sorcery",
+    8300: "7203_whimsy",
+}
+
+# Riot's API hosts for every platform (EUW1...) and regional (EUROPE...) routing value
+BASE_URLS = {
+    routing: f"https://{routing.lower()}.api.riotgames.com"
+    for routing in (*REGIONS, *REGIONS.values())
+}
+
+# Riot's API endpoints, their placeholders are filled with str.format
+SUMMONER_PATH = "/lol/summoner/v4/summoners/by-name/{}"
+LEAGUES_PATH = "/lol/league/v4/entries/by-summoner/{}"
+MATCHLIST_PATH = "/lol/match/v5/matches/by-puuid/{}/ids?start=0&count=100"
+MATCH_PATH = "/lol/match/v5/matches/{}"
+
+# Riot's documented way to send the key, keeps it out of urls and logs
+HEADERS = {"X-Riot-Token": API_KEY}
+
+PERKS_URL = "https://raw.communitydragon.org/latest/plugins/rcp-be-lol-game-data/global/default/v1/perks.json"
+
+# Shared client for sync requests, consecutive calls reuse the HTTP/2 connection.
+# Failed connections are retried, Riot's requests go through interactions' client.
+CLIENT = httpx.Client(
+    timeout=5.0,
+    transport=httpx.HTTPTransport(
+        http2=True,
+        retries=3,
+        limits=httpx.Limits(max_connections=50, max_keepalive_connections=20),
+    ),
+)
+
+
+def get_api_url(routing, path):
+    """Url of Riot's API endpoint for a platform or regional routing value"""
+    # Profile urls can have the server in any case, e.g. /euw1/NAME/
+    return BASE_URLS[routing.upper()] + path
+
+
+def get_retry_delay(headers, attempt):
+    """Seconds to wait after a 429, Riot's Retry-After or an exponential backoff"""
+    return int(headers.get("Retry-After", 2**attempt))
+
+
+def get_percentage(part, total):
+    """Whole percentage of part over total, 0 if total is 0"""
+    return 100 * part // total if total else 0
+
+
+def get_ratio(numerator, denominator):
+    """Ratio rounded to two decimals, 0 if denominator is 0"""
+    return round(numerator / denominator, 2) if denominator else 0
 
 
 def get_participant_number(match, puuid):
-    """ind summoner participant number in the match"""
-    participant_number = 0
-    while match["metadata"]["participants"][participant_number] != puuid:
-        participant_number += 1
-    return participant_number
+    """Find summoner participant number in the match"""
+    return match["metadata"]["participants"].index(puuid)
 
 
 def get_preview_stats(player_summary, game_duration):
@@ -72,6 +138,7 @@ def get_preview_stats(player_summary, game_duration):
     return player_summary
 
 
+@lru_cache(maxsize=8192)
 def get_date_by_timestamp(match_timestamp):
     """match date from unix timestamp
 
@@ -82,7 +149,21 @@ def get_date_by_timestamp(match_timestamp):
         str: date when match was created, e.g 2021-11-24
     """
 
-    return str((datetime.fromtimestamp(match_timestamp / 1000.0)).date())
+    return date.fromtimestamp(match_timestamp // 1000).isoformat()
+
+
+@lru_cache(maxsize=64)
+def get_patch(game_version):
+    """Patch for assets, only a few game versions are played at the same time
+
+    Args:
+        game_version (str): Version of the match, e.g 11.23.409.111
+
+    Returns:
+        str: patch of the match assets, e.g 11.23.1
+    """
+
+    return ".".join(game_version.split(".")[:2]) + ".1"
 
 
 def get_region_by_platform(platform):
@@ -91,75 +172,34 @@ def get_region_by_platform(platform):
     The ASIA routing value serves KR and JP.
     The EUROPE routing value serves EUNE, EUW, TR, and RU.
     """
-    if platform in ("NA1", "BR1", "LA1", "LA2", "OC1"):
-        region = "AMERICAS"
-
-    elif platform in ("EUN1", "EUW1", "TR1", "RU"):
-        region = "EUROPE"
-
-    elif platform in ("KR", "JP1"):
-        region = "ASIA"
-
-    return region
+    return REGIONS[platform.upper()]
 
 
 def get_match_mode(queue_id):
     """Get match mode by the queue_id"""
-    match queue_id:
-        case 400:
-            return "Normal Draft"
-        case 420:
-            return "Ranked Solo"
-        case 430:
-            return "Normal Blind"
-        case _:
-            return "Special"
+    return QUEUE_MODES.get(queue_id, "Special")
 
 
 def get_summoner_spell(summoner_key):
     """Get summoner spell by the summoner_key"""
-    match summoner_key:
-        case 1:
-            return "summoner_boost"
-        case 3:
-            return "summoner_exhaust"
-        case 4:
-            return "summoner_flash"
-        case 6:
-            return "summoner_haste"
-        case 7:
-            return "summoner_heal"
-        case 11:
-            return "summoner_smite"
-        case 12:
-            return "summoner_teleport"
-        case 13:
-            return "summonermana"
-        case 14:
-            return "summonerignite"
-        case 21:
-            return "summonerbarrier"
-        case 32:
-            return "summoner_mark"
-        case _:
-            return "summoner_empty"
-
-
-def get_rune_primary(rune_id, perks_json):
-    rune_dict = next((item for item in perks_json if item["id"] == rune_id), None)
-    return rune_dict["iconPath"].split("Styles/", 1)[1]
+    return SUMMONER_SPELLS.get(summoner_key, "summoner_empty")
+
+
+@cached(TTLCache(maxsize=1, ttl=3600), lock=Lock())
+def get_perks():
+    """Rune icon paths by rune id, refreshed from CommunityDragon every hour"""
+    response = CLIENT.get(PERKS_URL)
+    response.raise_for_status()
+    perks_json = orjson.loads(response.content)
+    return {item["id"]: item["iconPath"] for item in perks_json}
+
+
+def get_rune_primary(rune_id, perks):
+    """Get rune by the rune_id from the perks of get_perks"""
+    # Only keystones are looked up, stat shards paths don't have Styles/
+    return perks[rune_id].split("Styles/", 1)[1]
 
 
 def get_rune_secondary(rune_id):
     """Get rune by the rune_id"""
-    match rune_id:
-        case 8000:
-            return "7201_precision"
-        case 8100:
-            return "7200_domination"
-        case 8200:
-            return "7202_sorcery"
-        case 8300:
-            return "7203_whimsy"
-        case _:
-            return "7204_resolve"
+    return RUNE_SECONDARY.get(rune_id, "7204_resolve")
@@ -1,19 +1,196 @@
 """
 Contains functions that interacts with RIOT's API.
 """
-from api.utils import helpers, sessions
+from api.utils import helpers
 from api.models import Match
 from asgiref.sync import sync_to_async
+from cachetools import TTLCache
+from django.core.cache import cache
 from datetime import timedelta
-from decouple import config
-from aiohttp import ClientSession
-from asyncio import ensure_future, gather, run, sleep
+from asyncio import (
+    Lock,
+    Semaphore,
+    gather,
+    new_event_loop,
+    run_coroutine_threadsafe,
+    sleep,
+)
+from collections import deque
+from contextlib import asynccontextmanager
+from copy import deepcopy
+from functools import wraps
+from random import uniform
+from threading import Lock as ThreadLock, Thread
+from time import monotonic, time
+from urllib.parse import quote
+import atexit
+import httpx
+import orjson
+
+
+# asyncio.run() closes its loop when it returns, and an async client can't be
+# used outside the loop it was created in. Keep one loop alive in a background
+# thread so the shared client and its connection pool survive between views.
+_LOOP = None
+_LOOP_LOCK = ThreadLock()
+_CLIENT = None
+_CLIENT_LOCK = Lock()
+
+
+def run_in_loop(coroutine):
+    """Run coroutine in the background event loop and wait for its result"""
+    global _LOOP
+    with _LOOP_LOCK:
+        if _LOOP is None:
+            _LOOP = new_event_loop()
+            Thread(target=_LOOP.run_forever, daemon=True).start()
+    return run_coroutine_threadsafe(coroutine, _LOOP).result()
+
+
+async def get_client():
+    """Shared HTTP/2 client, created on first use inside the background loop
+
+    HTTP/2 multiplexes concurrent requests to the same Riot host over a single
+    connection instead of opening one connection per request.
+    """
+    global _CLIENT
+    async with _CLIENT_LOCK:
+        if _CLIENT is None:
+            _CLIENT = httpx.AsyncClient(
+                http2=True,
+                headers=helpers.HEADERS,
+                timeout=10.0,
+                limits=httpx.Limits(
+                    max_connections=64,
+                    max_keepalive_connections=64,
+                    keepalive_expiry=75,
+                ),
+            )
+    return _CLIENT
+
+
+@atexit.register
+def close_client():
+    """Close the shared client when the process exits"""
+    if _CLIENT is not None:
+        run_coroutine_threadsafe(_CLIENT.aclose(), _LOOP).result(timeout=5)
+
+
+class RateLimiter:
+    """Allows at most `calls` requests in any window of `period` seconds"""
+
+    def __init__(self, calls, period):
+        self.period = period
+        self.sent = deque(maxlen=calls)
+        self.lock = Lock()
+
+    async def acquire(self):
+        async with self.lock:
+            if len(self.sent) == self.sent.maxlen:
+                # Wait until the oldest request in the window expires
+                delay = self.sent[0] + self.period - monotonic()
+                if delay > 0:
+                    await sleep(delay)
+            self.sent.append(monotonic())
+
+
+# Riot's personal API key limits: 20 requests every second and 100 every 2 minutes
+_RATE_LIMITERS = (RateLimiter(20, 1), RateLimiter(100, 120))
+_CONCURRENCY = Semaphore(64)
+
+
+@asynccontextmanager
+async def riot_request_slot():
+    """Wait until a request can be sent to Riot's API without being throttled"""
+    async with _CONCURRENCY:
+        for limiter in _RATE_LIMITERS:
+            await limiter.acquire()
+        yield
+
+
+def riot_retry(max_attempts=3):
+    """Retry the decorated request while Riot's API is throttling or unavailable
+
+    The wait is Riot's Retry-After or an exponential backoff, plus a random jitter
+    so the requests throttled together don't all retry at the same moment.
+    """
+
+    def decorator(request):
+        @wraps(request)
+        async def wrapper(*args, **kwargs):
+            for attempt in range(max_attempts - 1):
+                response = await request(*args, **kwargs)
+                status = response.status_code
+                if status != 429 and status < 500:
+                    return response
+
+                delay = helpers.get_retry_delay(response.headers, attempt)
+                delay += uniform(0, 0.5 * 2**attempt)
+                print(f"Riot's API returned {status}, sleeping for {delay:.1f} seconds")
+                await sleep(delay)
+
+            # Last attempt, its response is returned whatever its status
+            return await request(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+@riot_retry()
+async def riot_get(client, url):
+    """Send a GET request to Riot's API once the rate limiters allow it"""
+    async with riot_request_slot():
+        return await client.get(url)
+
+
+# Summoner ids don't change, so found summoners are kept for 10 minutes.
+# Unknown names only for 30 seconds, the account could be created meanwhile.
+# Only used from the background loop thread, so they don't need a lock.
+_SUMMONER_CACHE = TTLCache(maxsize=4096, ttl=600)
+_SUMMONER_NOT_FOUND_CACHE = TTLCache(maxsize=4096, ttl=30)
+
 
+def get_summoner_league(server, summoner_name, summoner_league=None):
+    """Sync wrapper of fetch_summoner_league for callers outside the event loop"""
+    return run_in_loop(fetch_summoner_league(server, summoner_name, summoner_league))
 
-API_KEY = config("API")
 
+async def fetch_summoner_league(server, summoner_name, summoner_league=None):
+    """Async chain of the summoner request followed by its leagues and matchlist
+    requests, which are sent concurrently
 
-def get_summoner(server, summoner_name):
+    Args:
+        summoner_league     (tuple)     Summoner and leagues JSON already loaded,
+                                        only the matchlist is requested then
+
+    Returns:
+        Tuple with the summoner JSON, the leagues JSON and the matchlist, the
+        last two are empty if the summoner wasn't found.
+    """
+    client = await get_client()
+
+    # New matches can be played at any moment, the matchlist is always requested
+    if summoner_league is not None:
+        summoner_json, summoner_league_json = summoner_league
+        if not summoner_json["success"]:
+            return summoner_json, summoner_league_json, []
+
+        matchlist = await get_matchlist(client, server, summoner_json["puuid"])
+        return summoner_json, summoner_league_json, matchlist
+
+    summoner_json = await get_summoner(client, server, summoner_name)
+    if not summoner_json["success"]:
+        return summoner_json, {}, []
+
+    summoner_league_json, matchlist = await gather(
+        get_leagues(client, server, summoner_json["id"]),
+        get_matchlist(client, server, summoner_json["puuid"]),
+    )
+    return summoner_json, summoner_league_json, matchlist
+
+
+async def get_summoner(client, server, summoner_name):
     """Request:
     https://SERVER.api.riotgames.com/lol/summoner/v4/summoners/by-name/SUMMONER_NAME
 
@@ -31,30 +208,35 @@ def get_summoner(server, summoner_name):
             summonerLevel 	(long)
     """
 
-    url = (
-        "https://"
-        + server
-        + ".api.riotgames.com/lol/summoner/v4/summoners/by-name/"
-        + summoner_name
-        + "?api_key="
-        + API_KEY
+    key = (server, summoner_name.lower())
+    summoner_json = _SUMMONER_CACHE.get(key) or _SUMMONER_NOT_FOUND_CACHE.get(key)
+    if summoner_json is not None:
+        return dict(summoner_json)
+
+    url = helpers.get_api_url(
+        server, helpers.SUMMONER_PATH.format(quote(summoner_name))
     )
-    response = helpers.get_response(url)
-    summoner_json = response.json()
-    summoner_json["success"] = response.status_code == 200
-    return summoner_json
+    summoner_json = await get_json(client, url)
 
+    if summoner_json is not None:
+        summoner_json["success"] = True
+        _SUMMONER_CACHE[key] = summoner_json
+    else:
+        summoner_json = {"success": False}
+        _SUMMONER_NOT_FOUND_CACHE[key] = summoner_json
+    return dict(summoner_json)
 
-def get_summoner_league(request, server, summoner_name):
+
+async def get_leagues(client, server, summoner_id):
     """Request:
     https://SERVER.api.riotgames.com/lol/league/v4/entries/by-summoner/SUMMONER_ID
 
     Args:
         server              (string)    Player's region
-        summoner_name       (string)    Summoner name
+        summoner_id         (string)    Encrypted summoner ID
 
     Returns:
-        List of two dictionaries with:
+        JSON with RANKED_SOLO_5x5 and RANKED_FLEX_SR keys, each with:
             leagueId 	    (string)
             summonerId 	    (string) 	Player's encrypted summonerId.
             summonerName 	(string)
@@ -66,43 +248,25 @@ def get_summoner_league(request, server, summoner_name):
             losses 	        (int) 	    Losing team on Summoners Rift.
     """
 
-    summoner_json = sessions.load_summoner(request, server, summoner_name)
-
-    if summoner_json["success"]:
-
-        url = (
-            "https://"
-            + server
-            + ".api.riotgames.com/lol/league/v4/entries/by-summoner/"
-            + summoner_json["id"]
-            + "?api_key="
-            + API_KEY
-        )
-        # This json is a list of dictionaries
-        summoner_league_list = helpers.get_response(url).json()
-        # Set default values for each league
-        solo = {"tier": "Unranked"}
-        flex = {"tier": "Unranked"}
-
-        for queue in summoner_league_list:
-            queue["win_rate"] = round(
-                (queue["wins"] / (queue["wins"] + queue["losses"])) * 100
-            )
-
-            if queue["queueType"] == "RANKED_SOLO_5x5":
-                solo = queue
-            elif queue["queueType"] == "RANKED_FLEX_SR":
-                flex = queue
+    # This json is a list of dictionaries
+    (summoner_league_list,) = await get_leagues_json_list(client, server, [summoner_id])
+    # Set default values for each league
+    solo = {"tier": "Unranked"}
+    flex = {"tier": "Unranked"}
 
-        summoner_league_json = {"RANKED_SOLO_5x5": solo, "RANKED_FLEX_SR": flex}
+    for queue in summoner_league_list:
+        wins = queue["wins"]
+        queue["win_rate"] = helpers.get_percentage(wins, wins + queue["losses"])
 
-    else:
-        summoner_league_json = {}
+        if queue["queueType"] == "RANKED_SOLO_5x5":
+            solo = queue
+        elif queue["queueType"] == "RANKED_FLEX_SR":
+            flex = queue
 
-    return summoner_json, summoner_league_json
+    return {"RANKED_SOLO_5x5": solo, "RANKED_FLEX_SR": flex}
 
 
-def get_matchlist(server, puuid):
+async def get_matchlist(client, server, puuid):
     """Request:
     https://SERVER.api.riotgames.com/lol/match/v5/matches/by-puuid/{puuid}/ids
 
@@ -111,22 +275,33 @@ def get_matchlist(server, puuid):
         puuid          (string)
 
     Returns:
-        List with match ids
+        List with match ids, reused for 60 seconds to absorb page reloads
     """
 
-    server = helpers.get_region_by_platform(server)
+    # Kept for a day with the time it was requested, so it can still be shown
+    # when Riot's API fails after the 60 seconds
+    cache_key = f"matchlist:{puuid}"
+    cached = await cache.aget(cache_key)
+    if cached is not None and time() - cached[0] < 60:
+        return cached[1]
 
-    url = (
-        "https://"
-        + server
-        + ".api.riotgames.com/lol/match/v5/matches/by-puuid/"
-        + puuid
-        + "/ids?start=0&count=100&api_key="
-        + API_KEY
-    )
+    server = helpers.get_region_by_platform(server)
 
-    matchlist = helpers.get_response(url).json()
+    url = helpers.get_api_url(server, helpers.MATCHLIST_PATH.format(puuid))
 
+    try:
+        matchlist = await get_json(client, url)
+    except (httpx.TransportError, httpx.HTTPStatusError) as error:
+        # Only while Riot's API is unavailable or throttling, not e.g. a revoked key
+        if isinstance(error, httpx.HTTPStatusError):
+            status = error.response.status_code
+            if status != 429 and status < 500:
+                raise
+        if cached is None:
+            raise
+        return cached[1]
+
+    await cache.aset(cache_key, (time(), matchlist), timeout=86400)
     return matchlist
 
 
@@ -136,108 +311,80 @@ async def get_match_json_list(matches):
     platform = (matches[0].split("_"))[0]
     region = helpers.get_region_by_platform(platform)
 
-    async with ClientSession() as session:
-        tasks = []
+    client = await get_client()
+    tasks = []
 
-        for match in matches:
-            url = (
-                "https://"
-                + region
-                + ".api.riotgames.com/lol/match/v5/matches/"
-                + match
-                + "?api_key="
-                + API_KEY
-            )
-            tasks.append(ensure_future(get_match_json(session, url, match)))
+    # Same host and path for every match, only the match id changes
+    match_url = helpers.get_api_url(region, helpers.MATCH_PATH)
+    for match in matches:
+        url = match_url.format(match)
+        tasks.append(get_match_json(client, url, match))
 
-        return await gather(*tasks)
+    return await gather(*tasks)
 
 
-async def get_match_json(session, url, match):
+async def get_match_json(client, url, match):
     """Async to get the json from the request"""
 
-    max_attempts = 3
-    attempts = 0
-    while attempts < max_attempts:
-        # Search for match json in database
-        matches = await sync_to_async(list)(
-            Match.objects.filter(match_id=match).exclude(match_json__exact={})
+    # Matches don't change once played, so they are cached without expiry
+    cache_key = f"match:{match}"
+    match_json = await cache.aget(cache_key)
+    if match_json is not None:
+        return match_json
+
+    # Search for match json in database
+    matches = await sync_to_async(list)(
+        Match.objects.filter(match_id=match).exclude(match_json__exact={})[:1]
+    )
+    if matches:
+        await cache.aset(cache_key, matches[0].match_json, timeout=None)
+        return matches[0].match_json
+
+    match_json = await get_json(client, url)
+    if match_json is None:
+        raise Exception(f"Match {match} not found")
+
+    # 0 is custom matches; 2000, 2010 and 2020 are tutorial matches
+    if match_json["info"]["queueId"] not in {0, 2000, 2010, 2020}:
+
+        # Get the date of match creation
+        match_json["date"] = helpers.get_date_by_timestamp(
+            match_json["info"]["gameCreation"]
         )
-        if matches:
-            return matches[0].match_json
+
+        match_json["patch"] = helpers.get_patch(match_json["info"]["gameVersion"])
+        if match_json["info"]["gameMode"] == "CLASSIC":
+            match_json["match_mode"] = helpers.get_match_mode(
+                match_json["info"]["queueId"]
+            )
         else:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    match = await response.json()
-                    # 0 is custom matches; 2000, 2010 and 2020 are tutorial matches
-                    if match["info"]["queueId"] not in {0, 2000, 2010, 2020}:
-
-                        # Get the date of match creation
-                        match["date"] = helpers.get_date_by_timestamp(
-                            match["info"]["gameCreation"]
-                        )
-
-                        # Get patch for assets, 11.23.409.111 -> 11.23.1
-                        patch = (
-                            ".".join(match["info"]["gameVersion"].split(".")[:2]) + ".1"
-                        )
-                        match["patch"] = patch
-                        if match["info"]["gameMode"] == "CLASSIC":
-                            match["match_mode"] = helpers.get_match_mode(
-                                match["info"]["queueId"]
-                            )
-                        else:
-                            match["match_mode"] = match["info"]["gameMode"]
-
-                        match["info"]["matchups"] = []
-                        for i in range(0, 5):
-                            match["info"]["matchups"].append(
-                                [
-                                    match["info"]["participants"][i],
-                                    match["info"]["participants"][i + 5],
-                                ]
-                            )
-                    return match
-
-                elif response.status == 429:
-                    print(
-                        "Rate limit exceeded, sleeping for "
-                        + response.headers["Retry-After"]
-                        + " seconds"
-                    )
-                    await sleep(int(response.headers["Retry-After"]))
-                attempts += 1
-
-    if attempts >= max_attempts:
-        raise Exception("Failed: Maxed out attempts")
-
-
-async def get_player_summary_list(matches, puuid, perks_json):
-    """Async to get a list of players summaries from match list"""
-    tasks = []
+            match_json["match_mode"] = match_json["info"]["gameMode"]
 
-    for match in matches:
-        tasks.append(ensure_future(get_player_summary(match, puuid, perks_json)))
+    await cache.aset(cache_key, match_json, timeout=None)
+    return match_json
 
-    return await gather(*tasks)
 
+def get_player_summary_list(matches, puuid, perks):
+    """Get a list of players summaries from match list"""
+    return [get_player_summary(match, puuid, perks) for match in matches]
 
-async def get_player_summary(match, puuid, perks_json):
-    """Async to organize the players data"""
+
+def get_player_summary(match, puuid, perks):
+    """Organize the players data"""
 
     participant_number = helpers.get_participant_number(match, puuid)
 
-    player_summary = match["info"]["participants"][participant_number]
+    match_info = match["info"]
+    # Copied, the match is saved as downloaded and shared by every summoner in it
+    player_summary = deepcopy(match_info["participants"][participant_number])
 
-    try:
-        player_summary["kda"] = round(
-            (player_summary["kills"] + player_summary["assists"])
-            / player_summary["deaths"],
-            2,
-        )
-    # Happens when zero deaths
-    except ZeroDivisionError:
-        player_summary["kda"] = player_summary["kills"] + player_summary["assists"]
+    kills = player_summary["kills"]
+    assists = player_summary["assists"]
+    deaths = player_summary["deaths"]
+    # With zero deaths, the kda is the kills plus the assists
+    player_summary["kda"] = (
+        round((kills + assists) / deaths, 2) if deaths != 0 else kills + assists
+    )
 
     player_summary["summoner_spell_1"] = helpers.get_summoner_spell(
         player_summary["summoner1Id"]
@@ -246,16 +393,16 @@ async def get_player_summary(match, puuid, perks_json):
         player_summary["summoner2Id"]
     )
 
+    perk_styles = player_summary["perks"]["styles"]
     player_summary["rune_primary"] = helpers.get_rune_primary(
-        player_summary["perks"]["styles"][0]["selections"][0]["perk"], perks_json
+        perk_styles[0]["selections"][0]["perk"], perks
     )
     player_summary["rune_secondary"] = helpers.get_rune_secondary(
-        player_summary["perks"]["styles"][1]["style"]
+        perk_styles[1]["style"]
     )
 
-    player_summary = helpers.get_preview_stats(
-        player_summary, match["info"]["gameDuration"] / 60
-    )
+    game_minutes = match_info["gameDuration"] / 60
+    player_summary = helpers.get_preview_stats(player_summary, game_minutes)
 
     player_summary["items"] = [
         player_summary["item0"],
@@ -268,21 +415,21 @@ async def get_player_summary(match, puuid, perks_json):
     ]
 
     player_summary["matchId"] = match["metadata"]["matchId"]
-    player_summary["gameMode"] = match["info"]["gameMode"]
-    player_summary["gameDuration"] = int(round(match["info"]["gameDuration"] / 60, 0))
+    player_summary["gameMode"] = match_info["gameMode"]
+    player_summary["gameDuration"] = int(round(game_minutes, 0))
     player_summary["gameCreation"] = helpers.get_date_by_timestamp(
-        match["info"]["gameCreation"]
+        match_info["gameCreation"]
     )
 
     return player_summary
 
 
-def match_summary(server, match_json):
-    """Request: https://SERVER.api.riotgames.com/lol/match/v4/matches/GAME_ID
+def match_summary(match_json, tiers):
+    """Organize the match info for the match details
 
     Args:
-        server          (string)
-        match_json       (dictionary)
+        match_json       (dictionary)   Info of the match JSON
+        tiers            (list)         Tier of each participant, from get_match_tiers
 
     Returns:
         JSON: Participants stats and game info
@@ -296,106 +443,101 @@ def match_summary(server, match_json):
     match_creation = helpers.get_date_by_timestamp(match_creation)
     match_json["gameCreation"] = match_creation
 
-    summoner_id_list = []
-
-    for participant in match_json["participants"]:
-        participant["totalMinionsKilled"] = (
-            participant["totalMinionsKilled"] + participant["neutralMinionsKilled"]
+    for participant, tier in zip(match_json["participants"], tiers):
+        participant["tier"] = tier
+        participant["totalMinionsKilled"] += participant["neutralMinionsKilled"]
+        participant["totalDamageDealtToChampions"] = round(
+            participant["totalDamageDealtToChampions"] / 1000, 1
+        )
+        participant["killParticipation"] = round(
+            participant["challenges"]["killParticipation"] * 100, 1
         )
-        participant["totalDamageDealtToChampions"] = round(participant["totalDamageDealtToChampions"] / 1000, 1)
-        participant["killParticipation"] = round(participant["challenges"]["killParticipation"] * 100, 1)
         participant["goldEarned"] = round(participant["goldEarned"] / 1000, 1)
-        summoner_id_list.append(participant["summonerId"])
 
     # Change vocabulary from Win/Fail to Victory/Defeat
     for team in match_json["teams"]:
-        if team["win"]:
-            team["win"] = "Victory"
-        else:
-            team["win"] = "Defeat"
-
-    # Get new match_json with the rank of each player. An API
-    # call is needed for each player so asyncio was used.
-    match_json = run(get_players_ranks(server, match_json, summoner_id_list))
+        team["win"] = "Victory" if team["win"] else "Defeat"
 
     return match_json
 
 
-async def get_players_ranks(server, match_json, summoner_id_list):
+def get_match_tiers(server, match_json):
+    """Tier of each participant of the match, e.g. GOLD II
+
+    An API call is needed for each player so asyncio was used.
+    """
+    summoner_id_list = [
+        participant["summonerId"] for participant in match_json["participants"]
+    ]
+    return run_in_loop(
+        get_players_ranks(server, match_json["queueId"], summoner_id_list)
+    )
+
+
+async def get_players_ranks(server, queue_id, summoner_id_list):
     """Async to get each player's rank from the match"""
 
-    async with ClientSession() as session:
+    client = await get_client()
+    summoners_leagues_list = await get_leagues_json_list(
+        client, server, summoner_id_list
+    )
+
+    # If it's a flex match, search for flex rank
+    queue_type = "RANKED_FLEX_SR" if queue_id == 440 else "RANKED_SOLO_5x5"
+
+    tiers = []
+    for leagues in summoners_leagues_list:
+        league = {item["queueType"]: item for item in leagues}.get(queue_type)
+
+        # If the player doesn't have rank, display Unranked
+        if league is None:
+            tiers.append("Unranked")
+
+        else:
+            tiers.append(f"{league['tier']} {league['rank']}")
+
+    return tiers
+
+
+async def get_leagues_json_list(client, server, summoner_id_list):
+    """Async to get the leagues of each summoner, cached for 30 seconds as ranks change
+
+    Cached leagues are read in a single round-trip and only the missing ones
+    are requested to Riot's API.
+    """
+
+    cache_keys = [f"leagues:{server}:{summoner_id}" for summoner_id in summoner_id_list]
+    leagues_by_key = await cache.aget_many(cache_keys)
+
+    missing = [
+        (cache_key, summoner_id)
+        for cache_key, summoner_id in zip(cache_keys, summoner_id_list)
+        if cache_key not in leagues_by_key
+    ]
+    if missing:
         tasks = []
-        for summoner_id in summoner_id_list:
-            url = (
-                "https://"
-                + server
-                + ".api.riotgames.com/lol/league/v4/entries/by-summoner/"
-                + summoner_id
-                + "?api_key="
-                + API_KEY
-            )
-            tasks.append(ensure_future(get_leagues_json(session, url)))
-
-        summoners_leagues_list = await gather(*tasks)
-        current_player = 0
-        for leagues in summoners_leagues_list:
-            try:
-                # If it's a flex match, search for flex rank
-                if match_json["queueId"] == 440:
-                    leagues = next(
-                        item
-                        for item in leagues
-                        if item["queueType"] == "RANKED_FLEX_SR"
-                    )
-                else:
-                    leagues = next(
-                        item
-                        for item in leagues
-                        if item["queueType"] == "RANKED_SOLO_5x5"
-                    )
-
-            # If the player doesn't have rank, set tier to Unranked
-            except StopIteration:
-                leagues = {
-                    "tier": "Unranked",
-                    "rank": None,
-                }
-
-            # If the player doesn't have rank, display Unranked
-            if leagues["rank"] is None:
-                match_json["participants"][current_player][
-                    "tier"
-                ] = f"{leagues['tier']}"
-
-            else:
-                match_json["participants"][current_player][
-                    "tier"
-                ] = f"{leagues['tier']} {leagues['rank']}"
-
-            current_player += 1
+        leagues_url = helpers.get_api_url(server, helpers.LEAGUES_PATH)
+        for _, summoner_id in missing:
+            url = leagues_url.format(summoner_id)
+            tasks.append(get_json(client, url))
 
-    return match_json
+        fetched_leagues = {
+            cache_key: leagues
+            for (cache_key, _), leagues in zip(missing, await gather(*tasks))
+        }
+        await cache.aset_many(fetched_leagues, timeout=30)
+        leagues_by_key.update(fetched_leagues)
 
+    return [leagues_by_key[cache_key] for cache_key in cache_keys]
 
-async def get_leagues_json(session, url):
-    """Async to get the json from the request"""
 
-    max_attempts = 3
-    attempts = 0
-    while attempts < max_attempts:
-        async with session.get(url) as response:
-            if response.status == 200:
-                return await response.json()
-
-            elif response.status == 429:
-                print(
-                    "Rate limit exceeded, sleeping for "
-                    + response.headers["Retry-After"]
-                    + "seconds"
-                )
-                await sleep(int(response.headers["Retry-After"]))
-            attempts += 1
-
-    if attempts >= max_attempts:
-        raise Exception("Failed: Maxed out attempts")
+async def get_json(client, url):
+    """Async to get the json from the request, None if it's not found"""
+
+    response = await riot_get(client, url)
+    if response.status_code == 404:
+        return None
+
+    # Other errors won't go away by retrying, raise them with their status
+    response.raise_for_status()
+    return orjson.loads(response.content)
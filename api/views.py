@@ -3,12 +3,11 @@ Python functions that takes a Web request and returns a Web response.
 """
 from django.shortcuts import render, redirect
 from django.http import JsonResponse
+from django.db import transaction
 
-from api.utils import databases, interactions, sessions
+from api.utils import databases, helpers, interactions, sessions
 from api.models import Summoner, Match
 
-from asyncio import run
-
 
 def index(request):
     """Home page"""
@@ -31,37 +30,46 @@ def user_info(request, server, summoner_name, template="api/profile.html"):
             "/" + request.POST["server"] + "/" + request.POST["summoners_name"] + "/"
         )
 
-    summoner, summoner_league = sessions.load_summoner_league(
-        request, server, summoner_name
+    session_summoner_league = sessions.load_summoner_league(request, summoner_name)
+    summoner, summoner_league, matchlist = interactions.get_summoner_league(
+        server, summoner_name, session_summoner_league
     )
+    if session_summoner_league is None:
+        sessions.save_summoner_league(request, summoner_name, summoner, summoner_league)
 
     if summoner["success"]:
         # if summoner not in database, create object for the stats database
-        if not Summoner.objects.filter(summoner=summoner_name).exists():
-            databases.create_user_db(summoner_name)
+        summoner_db = Summoner.objects.filter(summoner=summoner_name).first()
+        if summoner_db is None:
+            summoner_db = databases.create_user_db(summoner_name)
 
-        matchlist = interactions.get_matchlist(server, summoner["puuid"])
         databases.add_matches_to_db(matchlist, summoner_name)
         match_not_in_database = databases.find_matches_not_in_db(
             matchlist, summoner_name
         )
 
-        summoner_db = Summoner.objects.get(summoner=summoner_name)
-
         if match_not_in_database:
-            match_json_list = run(
+            match_json_list = interactions.run_in_loop(
                 interactions.get_match_json_list(match_not_in_database)
             )
-            databases.save_matches_to_db(match_json_list, summoner_name)
-
-            perks_json = sessions.load_perks_json(request)
-            player_summary_list = run(
-                interactions.get_player_summary_list(match_json_list, summoner["puuid"], perks_json)
+            # Resolved here, its hourly refresh is a blocking request
+            perks = helpers.get_perks()
+            # CPU work only, runs in the request thread instead of the shared loop
+            player_summary_list = interactions.get_player_summary_list(
+                match_json_list, summoner["puuid"], perks
             )
 
-            databases.save_player_summaries_to_db(player_summary_list, summoner_name)
             summoner_db = databases.update_summoner_db(summoner_db, player_summary_list)
-            summoner_db.save()
+
+            # Single commit, the stats are never saved without their matches
+            with transaction.atomic():
+                databases.save_matches_to_db(
+                    match_json_list, player_summary_list, summoner_name
+                )
+                # The summoner name never changes, only write the computed stats
+                summoner_db.save(
+                    update_fields=["matches", "minutes", "champions", "roles", "stats"]
+                )
 
         context = {
             "match_list": Match.objects.all().filter(summoner=summoner_name),
@@ -90,8 +98,14 @@ def get_match_data(request, server, summoner_name, match_id):
     Loads match information when load button is pressed in user_info
     """
     match_object = Match.objects.get(match_id=match_id, summoner=summoner_name)
-    match_info_json = sessions.load_match_summary(
-        request, server, match_id, match_object.match_json["info"]
-    )
 
-    return JsonResponse(match_info_json)
+    # Players ranks are requested only the first time the match is opened
+    if not match_object.tiers:
+        match_object.tiers = interactions.get_match_tiers(
+            server, match_object.match_json["info"]
+        )
+        databases.save_match_tiers_to_db(match_id, match_object.tiers)
+
+    return JsonResponse(
+        interactions.match_summary(match_object.match_json["info"], match_object.tiers)
+    )